@@ -0,0 +1,204 @@
+"""
+In-process caches for Emperion Knowledge Base
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import combinations
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, maxsize: int = 128, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Return the cached value, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a search query"""
+    return " ".join(query.lower().split())
+
+
+def load_embedder(model_name: str, cache_size: int = 4096) -> Optional[Callable[[str], Any]]:
+    """Return a text -> unit-vector function, or None if unavailable"""
+    if not model_name:
+        return None
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("⚠️  sentence-transformers not installed, semantic cache matches exact queries only")
+        return None
+
+    model = SentenceTransformer(model_name)
+
+    # Embeddings depend only on the text, so repeat queries skip the encoder
+    @lru_cache(maxsize=cache_size)
+    def embed(text: str) -> Any:
+        vector = model.encode(text, normalize_embeddings=True)
+        vector.setflags(write=False)
+        return vector
+
+    return embed
+
+
+class LSHIndex:
+    """Random-projection LSH over unit vectors, bucketed per scope.
+
+    A vector hashes to the sign pattern of its projections on `bits` random
+    hyperplanes; lookups probe the query's bucket and every bucket within
+    Hamming distance `radius`, so only near neighbours are compared.
+    """
+
+    def __init__(self, bits: int = 12, radius: int = 2, seed: int = 0):
+        self.bits = bits
+        self.radius = radius
+        self.seed = seed
+        self._planes = None
+        self._buckets: dict = {}
+
+    def _code(self, vector: Any) -> int:
+        if self._planes is None:
+            import numpy as np
+            rng = np.random.default_rng(self.seed)
+            self._planes = rng.standard_normal((self.bits, len(vector))).astype(np.float32)
+        code = 0
+        for bit in (self._planes @ vector) > 0:
+            code = (code << 1) | int(bit)
+        return code
+
+    def _probe_codes(self, code: int):
+        codes = [code]
+        for distance in range(1, self.radius + 1):
+            for flips in combinations(range(self.bits), distance):
+                neighbour = code
+                for bit in flips:
+                    neighbour ^= 1 << bit
+                codes.append(neighbour)
+        return codes
+
+    def add(self, scope: Hashable, key: Hashable, vector: Any) -> None:
+        self._buckets.setdefault((scope, self._code(vector)), set()).add(key)
+
+    def remove(self, scope: Hashable, key: Hashable, vector: Any) -> None:
+        bucket_key = (scope, self._code(vector))
+        bucket = self._buckets.get(bucket_key)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[bucket_key]
+
+    def candidates(self, scope: Hashable, vector: Any) -> set:
+        """Keys stored near vector within scope"""
+        found = set()
+        for code in self._probe_codes(self._code(vector)):
+            found |= self._buckets.get((scope, code), set())
+        return found
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class SemanticCache:
+    """Query result cache matching exact and near-identical queries.
+
+    Entries are grouped by scope (filters, limit). A lookup first tries the
+    normalized query text; when an embedder is configured it then compares the
+    query embedding with the cached ones sharing its LSH buckets and returns
+    the closest entry whose cosine similarity reaches the threshold.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 30.0,
+        threshold: float = 0.95,
+        embed: Optional[Callable[[str], Any]] = None
+    ):
+        self.threshold = threshold
+        self.embed = embed
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._embeddings: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._index = LSHIndex()
+        self._lock = threading.Lock()
+
+    def get(self, query: str, scope: Hashable) -> Any:
+        """Return cached results for the query within scope, or None"""
+        text = normalize_query(query)
+        results = self._entries.get((scope, text))
+        if results is not None or self.embed is None:
+            return results
+
+        vector = self.embed(text)
+        with self._lock:
+            candidates = [
+                (float(vector @ self._embeddings[key]), key)
+                for key in self._index.candidates(scope, vector)
+            ]
+        for similarity, key in sorted(candidates, reverse=True):
+            if similarity < self.threshold:
+                break
+            results = self._entries.get(key)
+            if results is not None:
+                return results
+        return None
+
+    def set(self, query: str, scope: Hashable, results: Any) -> None:
+        """Cache results for the query within scope"""
+        key = (scope, normalize_query(query))
+        self._entries.set(key, results)
+        if self.embed is None:
+            return
+
+        vector = self.embed(key[1])
+        with self._lock:
+            previous = self._embeddings.pop(key, None)
+            if previous is not None:
+                self._index.remove(scope, key, previous)
+            self._embeddings[key] = vector
+            self._index.add(scope, key, vector)
+            while len(self._embeddings) > self._entries.maxsize:
+                old_key, old_vector = self._embeddings.popitem(last=False)
+                self._index.remove(old_key[0], old_key, old_vector)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        self._entries.clear()
+        with self._lock:
+            self._embeddings.clear()
+            self._index.clear()
@@ -0,0 +1,69 @@
+"""
+Request coalescing for Emperion Knowledge Base
+"""
+import asyncio
+from typing import Any, Callable, Dict, Hashable, List, Set, Tuple
+
+
+class BatchCoalescer:
+    """Merge concurrent single-key calls into one batched call.
+
+    Items submitted within `max_wait` seconds of each other (or until
+    `max_batch` keys accumulate) are deduplicated by key, the last item
+    winning, and passed together to `fetch`, a blocking function returning
+    {key: value}; it runs in a worker thread. Keys missing from the result
+    resolve to None.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[List[Any]], Dict[Hashable, Any]],
+        max_batch: int = 64,
+        max_wait: float = 0.005
+    ):
+        self.fetch = fetch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: Dict[Hashable, Tuple[Any, List[asyncio.Future]]] = {}
+        self._timer = None
+        # The loop keeps only weak references to tasks; hold in-flight batches here
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, key: Hashable, item: Any = None) -> Any:
+        """Resolve key as part of the next batch; fetch receives item (default: key)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        _, futures = self._pending.get(key, (None, []))
+        futures.append(future)
+        self._pending[key] = (key if item is None else item, futures)
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[Hashable, Tuple[Any, List[asyncio.Future]]]) -> None:
+        try:
+            results = await asyncio.to_thread(self.fetch, [item for item, _ in batch.values()])
+        except Exception as e:
+            for _, futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for key, (_, futures) in batch.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(results.get(key))
@@ -1,19 +1,92 @@
 """
 Database layer for Emperion Knowledge Base
 """
-import json
+import asyncio
+import csv
+import io
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any
+import orjson
 from sqlalchemy import (
-    create_engine, Column, String, DateTime, Integer,
-    Text, JSON, Index, text
+    bindparam, create_engine, Column, Computed, String, DateTime, Integer,
+    Text, Index, MetaData, Table, func, literal_column, make_url, or_, select, text,
+    tuple_
 )
-from sqlalchemy.orm import declarative_base, sessionmaker, Session
+from sqlalchemy.dialects.postgresql import ENUM, JSONB, TSVECTOR, insert as pg_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import declarative_base, deferred, sessionmaker, Session
+from sqlalchemy.schema import CreateColumn
+from cache import SemanticCache, TTLCache, load_embedder, normalize_query
 from config import config
-from models import FileKnowledge, SearchQuery, IndexStats, DependencyGraph
+from models import (
+    FileKnowledge, SearchQuery, IndexStats, DependencyGraph, FileType, Technology
+)
 
 Base = declarative_base()
 
+# Generated columns may not contain subqueries, so JSONB arrays are flattened
+# through this immutable helper (created by init_db before the table)
+_ARRAY_TEXT_FUNCTION = """
+CREATE OR REPLACE FUNCTION file_index_array_text(arr jsonb) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+$$ SELECT coalesce(string_agg(elem, E'\\n'), '') FROM jsonb_array_elements_text(arr) elem $$
+"""
+
+def _json_text(value: Any) -> str:
+    """Compact JSON text for a JSONB value (orjson instead of the stdlib encoder)"""
+    return orjson.dumps(value).decode()
+
+
+# Advisory lock held by init_db for the duration of its transaction
+_INIT_LOCK_KEY = 0x656D70  # "emp"
+
+# Tables created before the JSONB switch still have json columns
+_JSON_TO_JSONB = """
+DO $$
+DECLARE col text;
+BEGIN
+    FOR col IN
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'file_index' AND data_type = 'json'
+    LOOP
+        EXECUTE format(
+            'ALTER TABLE file_index ALTER COLUMN %I TYPE jsonb USING %I::jsonb', col, col
+        );
+    END LOOP;
+END $$
+"""
+
+# file_type/technology were varchar columns before they became enums
+_VARCHAR_TO_ENUM = """
+DO $$
+DECLARE col record;
+BEGIN
+    FOR col IN
+        SELECT column_name, udt FROM (VALUES
+            ('file_type', 'file_type_enum'), ('technology', 'technology_enum')
+        ) AS enums(column_name, udt)
+        JOIN information_schema.columns USING (column_name)
+        WHERE table_schema = current_schema()
+          AND table_name = 'file_index' AND data_type = 'character varying'
+    LOOP
+        EXECUTE format(
+            'ALTER TABLE file_index ALTER COLUMN %I TYPE %I USING %I::%I',
+            col.column_name, col.udt, col.column_name, col.udt
+        );
+    END LOOP;
+END $$
+"""
+
+
+def _enum_labels(enum_cls) -> List[str]:
+    """Database labels for an enum: its values ('bicep'), read back as plain strings"""
+    return [member.value for member in enum_cls]
+
 
 class FileIndex(Base):
     """Database model for file index"""
@@ -22,284 +95,755 @@ class FileIndex(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     path = Column(String(500), unique=True, nullable=False, index=True)
     repo = Column(String(100), nullable=False, index=True)
-    file_type = Column(String(50), nullable=False, index=True)
-    technology = Column(String(50), nullable=False, index=True)
+    # Native enums: 4 bytes per row instead of the label text, in the heap and every index
+    file_type = Column(
+        ENUM(*_enum_labels(FileType), name='file_type_enum'),
+        nullable=False, index=True
+    )
+    technology = Column(
+        ENUM(*_enum_labels(Technology), name='technology_enum'),
+        nullable=False, index=True
+    )
     
     summary = Column(Text, nullable=False)
-    key_elements = Column(JSON, nullable=False, default=list)
-    dependencies = Column(JSON, nullable=False, default=list)
-    dependents = Column(JSON, nullable=False, default=list)
-    tags = Column(JSON, nullable=False, default=list)
+    key_elements = Column(JSONB, nullable=False, default=list)
+    dependencies = Column(JSONB, nullable=False, default=list)
+    dependents = Column(JSONB, nullable=False, default=list)
+    tags = Column(JSONB, nullable=False, default=list)
     
     content_hash = Column(String(64), nullable=False)
     indexed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    file_metadata = Column(JSON, nullable=False, default=dict)
+    file_metadata = Column(JSONB, nullable=False, default=dict)
+    
+    # Derived columns below are only used inside SQL, so they are deferred:
+    # select(FileIndex) (and the read cache) never carries them.
+    # Flattened arrays so element substring matches can use trigram indexes
+    key_elements_text = deferred(Column(
+        Text, Computed("file_index_array_text(key_elements)", persisted=True)
+    ))
+    tags_text = deferred(Column(Text, Computed("file_index_array_text(tags)", persisted=True)))
+    # Word-level document for full-text search over summary, key elements and tags
+    search_doc = deferred(Column(TSVECTOR, Computed(
+        "to_tsvector('simple', summary || ' ' || file_index_array_text(key_elements)"
+        " || ' ' || file_index_array_text(tags))",
+        persisted=True
+    )))
+    # Kept alongside dependencies so get_stats sums an integer instead of decoding JSONB
+    deps_count = deferred(Column(Integer, Computed("jsonb_array_length(dependencies)", persisted=True)))
     
     # Indexes for better query performance
     __table_args__ = (
         Index('idx_repo_filetype', 'repo', 'file_type'),
         Index('idx_technology', 'technology'),
         Index('idx_indexed_at', 'indexed_at'),
+        # search_by_type: one type, newest first (scanned backwards)
+        Index('idx_filetype_indexedat', 'file_type', 'indexed_at'),
+        # find_related: same repo, same technology first, newest first
+        Index('idx_repo_tech_indexedat', 'repo', 'technology', 'indexed_at'),
+        # Trigram index so the leading-wildcard ILIKE in search_knowledge can use it
+        Index(
+            'idx_summary_trgm', 'summary',
+            postgresql_using='gin',
+            postgresql_ops={'summary': 'gin_trgm_ops'}
+        ),
+        Index(
+            'idx_key_elements_text_trgm', 'key_elements_text',
+            postgresql_using='gin',
+            postgresql_ops={'key_elements_text': 'gin_trgm_ops'}
+        ),
+        Index(
+            'idx_tags_text_trgm', 'tags_text',
+            postgresql_using='gin',
+            postgresql_ops={'tags_text': 'gin_trgm_ops'}
+        ),
+        Index('idx_search_doc', 'search_doc', postgresql_using='gin'),
+        # Exact tag containment (tags @> '["x"]')
+        Index(
+            'idx_tags_gin', 'tags',
+            postgresql_using='gin',
+            postgresql_ops={'tags': 'jsonb_path_ops'}
+        ),
     )
 
 
+# search_by_type takes file_type as a raw string; O(1) check before querying
+_FILE_TYPE_LABELS = frozenset(_enum_labels(FileType))
+
+
+# Staging table for bulk upserts, created per transaction by _upsert_rows
+_stage_table = Table(
+    "file_index_stage",
+    MetaData(),
+    *(
+        Column(c.name, c.type)
+        for c in FileIndex.__table__.columns
+        if c.name not in ("id", "indexed_at") and c.computed is None
+    ),
+)
+_STAGE_COLUMNS = ", ".join(c.name for c in _stage_table.columns)
+# Staged rows are loaded with COPY ... FORMAT csv; JSONB values go in as JSON text
+_STAGE_JSON_COLUMNS = frozenset(c.name for c in _stage_table.columns if isinstance(c.type, JSONB))
+_STAGE_COPY = f"COPY {_stage_table.name} ({_STAGE_COLUMNS}) FROM STDIN WITH (FORMAT csv)"
+
+# Columns overwritten when an upsert hits an existing path
+_UPSERT_COLUMNS = tuple(c.name for c in _stage_table.columns if c.name != "path") + ("indexed_at",)
+_UPSERT_SET = ", ".join(f"{name} = EXCLUDED.{name}" for name in _UPSERT_COLUMNS)
+
+
+# Per written row: the new stats dimensions and, for updates, the previous ones.
+# Every part of a WITH statement sees the same snapshot, so "prev" reads the
+# rows as they were before the upsert
+_STATS_RETURNING = "path, file_type, repo, technology, deps_count, indexed_at"
+_STATS_DELTA = (
+    "WITH prev AS ("
+    "SELECT path, file_type, repo, technology, deps_count FROM file_index "
+    "WHERE path IN (SELECT path FROM {stage})"
+    "), up AS ({upsert} RETURNING " + _STATS_RETURNING + ") "
+    "SELECT up.*, prev.file_type AS old_file_type, prev.repo AS old_repo, "
+    "prev.technology AS old_technology, prev.deps_count AS old_deps_count "
+    "FROM up LEFT JOIN prev USING (path)"
+)
+
+
+class _StatsCounters:
+    """IndexStats kept current by applying write deltas instead of rescanning.
+
+    Counters are rebuilt from one aggregate query at most every `ttl`
+    seconds (picking up writes made by other processes); in between, rows
+    written by this process are folded in as they commit.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._stats: Optional[IndexStats] = None
+
+    def get(self) -> Optional[IndexStats]:
+        """Current stats, or None if never loaded or due for a rebuild"""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+                return None
+            return self._stats
+
+    def peek(self) -> Optional[IndexStats]:
+        """Last known stats, however old"""
+        return self._stats
+
+    def load(self, stats: IndexStats) -> None:
+        with self._lock:
+            self._stats = stats
+            self._loaded_at = time.monotonic()
+
+    def apply(self, rows: List[Row]) -> None:
+        """Fold upserted rows (see _STATS_DELTA) into the counters"""
+        with self._lock:
+            if self._stats is None or not rows:
+                return
+            by_type = Counter(self._stats.files_by_type)
+            by_repo = Counter(self._stats.files_by_repo)
+            by_tech = Counter(self._stats.files_by_technology)
+            total, total_deps = self._stats.total_files, self._stats.total_dependencies
+            last = self._stats.last_indexed
+            
+            for row in rows:
+                if row.old_file_type is None:
+                    total += 1
+                else:
+                    by_type[row.old_file_type] -= 1
+                    by_repo[row.old_repo] -= 1
+                    by_tech[row.old_technology] -= 1
+                    total_deps -= row.old_deps_count
+                by_type[row.file_type] += 1
+                by_repo[row.repo] += 1
+                by_tech[row.technology] += 1
+                total_deps += row.deps_count
+                if last is None or row.indexed_at > last:
+                    last = row.indexed_at
+            
+            self._stats = IndexStats(
+                total_files=total,
+                files_by_type={k: v for k, v in by_type.items() if v > 0},
+                files_by_repo={k: v for k, v in by_repo.items() if v > 0},
+                files_by_technology={k: v for k, v in by_tech.items() if v > 0},
+                last_indexed=last,
+                total_dependencies=total_deps
+            )
+
+
+# Columns returned by the list endpoints; plain rows skip ORM identity-map overhead
+_LISTING_COLUMNS = (
+    FileIndex.path, FileIndex.repo, FileIndex.file_type, FileIndex.technology,
+    FileIndex.summary, FileIndex.key_elements, FileIndex.tags, FileIndex.indexed_at
+)
+
+# Base statement for search_knowledge, built once with named bind parameters.
+# All query words anywhere in the document (GIN on search_doc), or a substring
+# of summary, key elements or tags (trigram indexed). Ranked by full-text
+# relevance (substring-only matches rank 0), then most recent first
+_SEARCH_TERMS = bindparam("terms")
+_SEARCH_PATTERN = bindparam("pattern")
+_SEARCH_TSQUERY = func.plainto_tsquery(literal_column("'simple'::regconfig"), _SEARCH_TERMS)
+_SEARCH_STMT = (
+    select(*_LISTING_COLUMNS)
+    .where(or_(
+        FileIndex.search_doc.bool_op("@@")(_SEARCH_TSQUERY),
+        FileIndex.summary.ilike(_SEARCH_PATTERN),
+        FileIndex.key_elements_text.ilike(_SEARCH_PATTERN),
+        FileIndex.tags_text.ilike(_SEARCH_PATTERN)
+    ))
+    .order_by(
+        func.ts_rank(FileIndex.search_doc, _SEARCH_TSQUERY).desc(),
+        FileIndex.indexed_at.desc()
+    )
+)
+
+
+# Transitive dependencies of :root down to :max_depth levels. UNION drops repeated
+# (path, depth) pairs, so cycles stop growing once depth is exhausted
+_DEPENDENCY_TREE = text("""
+WITH RECURSIVE tree(path, depth) AS (
+    SELECT dep.path, 1
+    FROM file_index f
+    CROSS JOIN LATERAL jsonb_array_elements_text(f.dependencies) AS dep(path)
+    WHERE f.path = :root
+  UNION
+    SELECT dep.path, tree.depth + 1
+    FROM tree
+    JOIN file_index f ON f.path = tree.path
+    CROSS JOIN LATERAL jsonb_array_elements_text(f.dependencies) AS dep(path)
+    WHERE tree.depth < :max_depth
+)
+SELECT path, min(depth) AS depth
+FROM tree
+WHERE path <> :root
+GROUP BY path
+ORDER BY depth, path
+""")
+
+
 class DatabaseManager:
     """Manage database operations"""
     
     def __init__(self):
-        self.engine = create_engine(config.DATABASE_URL)
-        self.SessionLocal = sessionmaker(bind=self.engine)
+        url = make_url(config.DATABASE_URL)
+        if url.drivername in ("postgres", "postgresql"):
+            # Pin psycopg2 (the driver in requirements.txt) for its batched executemany
+            url = url.set(drivername="postgresql+psycopg2")
+        
+        self.engine = create_engine(
+            url,
+            # Multi-row INSERT ... VALUES pages, execute_batch for UPDATE/DELETE
+            executemany_mode="values_plus_batch",
+            insertmanyvalues_page_size=1000,
+            executemany_batch_page_size=500,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_recycle=1800,
+            pool_pre_ping=True,
+            # JSONB parameters (key_elements, tags, file_metadata, ...)
+            json_serializer=_json_text
+        )
+        # Results are returned after commit, so don't expire (and reload) them
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False)
+        
+        # Read results are keyed on the write version, so any local write
+        # invalidates them; the TTL bounds staleness from other processes.
+        # Writes run in worker threads, so bumps happen under _write_lock
+        self._write_version = 0
+        self._write_lock = threading.Lock()
+        self._read_cache = TTLCache(maxsize=2048, ttl=config.QUERY_CACHE_TTL)
+        self._search_cache = SemanticCache(
+            maxsize=1024,
+            ttl=config.QUERY_CACHE_TTL,
+            threshold=config.SEMANTIC_CACHE_THRESHOLD,
+            embed=load_embedder(config.SEMANTIC_CACHE_MODEL, config.EMBEDDING_CACHE_SIZE)
+        )
+        self._stats = _StatsCounters(ttl=config.QUERY_CACHE_TTL)
         
     def init_db(self):
         """Initialize database tables"""
-        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            # Workers/instances booting together must not run the DDL concurrently
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _INIT_LOCK_KEY})
+            # Required by the gin_trgm_ops indexes
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(_ARRAY_TEXT_FUNCTION))
+            Base.metadata.create_all(conn)
+            
+            # create_all skips existing tables, so bring older schemas up to date
+            conn.execute(text(_JSON_TO_JSONB))
+            for column in (FileIndex.__table__.c.file_type, FileIndex.__table__.c.technology):
+                column.type.create(conn, checkfirst=True)
+                for label in column.type.enums:
+                    conn.execute(text(
+                        f"ALTER TYPE {column.type.name} ADD VALUE IF NOT EXISTS '{label}'"
+                    ))
+            conn.execute(text(_VARCHAR_TO_ENUM))
+            for column in FileIndex.__table__.columns:
+                if column.computed is not None:
+                    ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                    conn.execute(text(f"ALTER TABLE file_index ADD COLUMN IF NOT EXISTS {ddl}"))
+            for index in FileIndex.__table__.indexes:
+                index.create(conn, checkfirst=True)
         print("✅ Database tables created")
-        
+    
     def get_session(self) -> Session:
         """Get database session"""
         return self.SessionLocal()
     
-    # ==================== INDEXING ====================
-    
-    def index_file(self, file_knowledge: FileKnowledge) -> bool:
-        """Index a single file"""
-        session = self.get_session()
+    @contextmanager
+    def session_scope(self) -> Iterator[Session]:
+        """Session that commits on success, rolls back on error and always closes"""
+        session = self.SessionLocal()
         try:
-            # Check if file already exists
-            existing = session.query(FileIndex).filter_by(path=file_knowledge.path).first()
-            
-            if existing:
-                # Update existing
-                existing.repo = file_knowledge.repo
-                existing.file_type = file_knowledge.file_type.value
-                existing.technology = file_knowledge.technology.value
-                existing.summary = file_knowledge.summary
-                existing.key_elements = file_knowledge.key_elements
-                existing.dependencies = file_knowledge.dependencies
-                existing.dependents = file_knowledge.dependents
-                existing.tags = file_knowledge.tags
-                existing.content_hash = file_knowledge.content_hash
-                existing.indexed_at = datetime.utcnow()
-                existing.file_metadata = file_knowledge.file_metadata
-            else:
-                # Create new
-                new_file = FileIndex(
-                    path=file_knowledge.path,
-                    repo=file_knowledge.repo,
-                    file_type=file_knowledge.file_type.value,
-                    technology=file_knowledge.technology.value,
-                    summary=file_knowledge.summary,
-                    key_elements=file_knowledge.key_elements,
-                    dependencies=file_knowledge.dependencies,
-                    dependents=file_knowledge.dependents,
-                    tags=file_knowledge.tags,
-                    content_hash=file_knowledge.content_hash,
-                    file_metadata=file_knowledge.file_metadata
-                )
-                session.add(new_file)
-            
+            yield session
             session.commit()
-            return True
-            
-        except Exception as e:
+        except Exception:
             session.rollback()
-            print(f"❌ Error indexing file {file_knowledge.path}: {e}")
-            return False
+            raise
         finally:
             session.close()
     
-    def index_batch(self, files: List[FileKnowledge]) -> Dict[str, int]:
-        """Index multiple files"""
-        results = {"success": 0, "failed": 0}
+    def _record_writes(self, written: List[Row]) -> None:
+        """Fold committed upserts (see _STATS_DELTA) into the stats and drop stale reads"""
+        if not written:
+            return
+        # Together, so get_stats never loads a rebuild that missed this write
+        with self._write_lock:
+            self._stats.apply(written)
+            self._write_version += 1
+        self._search_cache.clear()
+    
+    # ==================== INDEXING ====================
+    
+    @staticmethod
+    def _upsert_row(session: Session, row: Dict[str, Any]) -> List[Row]:
+        """Upsert one file_index row in a single statement (no commit).
         
-        for file in files:
-            if self.index_file(file):
-                results["success"] += 1
-            else:
-                results["failed"] += 1
+        Returns the row with its stats delta, or nothing if content_hash is unchanged.
+        """
+        stmt = pg_insert(FileIndex).values(**row, indexed_at=func.timezone('utc', func.now()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FileIndex.path],
+            set_={name: stmt.excluded[name] for name in _UPSERT_COLUMNS},
+            # Unchanged content: skip the update (no WAL, no index churn)
+            where=FileIndex.content_hash.is_distinct_from(stmt.excluded.content_hash)
+        )
+        return session.execute(DatabaseManager._with_stats_delta(stmt, row["path"])).all()
+    
+    @staticmethod
+    def _with_stats_delta(stmt, path: str):
+        """Wrap a single-row upsert so it returns its stats delta (see _STATS_DELTA)"""
+        dimensions = (FileIndex.file_type, FileIndex.repo, FileIndex.technology, FileIndex.deps_count)
+        prev = select(FileIndex.path, *dimensions).where(FileIndex.path == path).cte("prev")
+        up = stmt.returning(FileIndex.path, *dimensions, FileIndex.indexed_at).cte("up")
+        return select(
+            up,
+            *(prev.c[column.key].label(f"old_{column.key}") for column in dimensions)
+        ).select_from(up.outerjoin(prev, prev.c.path == up.c.path))
+    
+    def index_files(self, files: List[FileKnowledge]) -> Dict[str, bool]:
+        """Index files like aindex_batch, reporting success per path"""
+        rows, submitted = self._batch_rows(files)
+        _, written, failed = self._index_rows(rows, submitted)
+        self._record_writes(written)
+        return {row["path"]: row["path"] not in failed for row in rows}
+    
+    async def aindex_batch(self, files: List[FileKnowledge]) -> Dict[str, int]:
+        """Index multiple files, merging up to INDEX_CONCURRENCY chunks at once.
+
+        Rows are COPY-loaded into a temporary staging table and merged into
+        file_index with one INSERT ... ON CONFLICT statement per chunk of
+        INDEX_BATCH_CHUNK files, so a batch costs a handful of round-trips and
+        one commit per chunk; a failing chunk is rolled back and its rows
+        retried one at a time (see _index_rows).
+
+        Chunks run in a worker thread on its own pooled connection, so
+        round-trips overlap and the event loop is never blocked. Paths are
+        deduplicated first, so concurrent chunks never touch the same row.
+        """
+        rows, submitted = self._batch_rows(files)
+        chunk_size = config.INDEX_BATCH_CHUNK
+        if len(rows) <= chunk_size:
+            results, written, _ = await asyncio.to_thread(self._index_rows, rows, submitted)
+        else:
+            semaphore = asyncio.Semaphore(config.INDEX_CONCURRENCY)
+            
+            async def run(chunk):
+                async with semaphore:
+                    return await asyncio.to_thread(self._index_rows, chunk, submitted)
+            
+            outcomes = await asyncio.gather(*(
+                run(rows[start:start + chunk_size])
+                for start in range(0, len(rows), chunk_size)
+            ))
+            results = {
+                "success": sum(r["success"] for r, _, _ in outcomes),
+                "failed": sum(r["failed"] for r, _, _ in outcomes),
+            }
+            written = [row for _, w, _ in outcomes for row in w]
         
+        self._record_writes(written)
         return results
     
-    # ==================== SEARCH ====================
+    def _batch_rows(self, files: List[FileKnowledge]):
+        """Rows to upsert (one per path) and how many times each path was submitted"""
+        # ON CONFLICT cannot touch the same row twice in one statement,
+        # so keep only the last entry for each path
+        rows = list({f.path: self._to_row(f) for f in files}.values())
+        return rows, Counter(f.path for f in files)
     
-    def search_knowledge(self, query: SearchQuery) -> List[FileIndex]:
-        """Search for files matching query"""
+    def _index_rows(self, rows: List[Dict[str, Any]], submitted: Counter):
+        """Upsert rows in INDEX_BATCH_CHUNK chunks over one session.
+        
+        A chunk of one row skips the staging table. A failing chunk is rolled
+        back and its rows retried one at a time, so a bad row (say, an
+        over-long path) fails only itself. Returns the success/failed counts,
+        the rows written (with their stats deltas) and the failed paths.
+        """
+        results = {"success": 0, "failed": 0}
+        written, failed = [], set()
+        if not rows:
+            return results, written, failed
+        
+        chunk_size = config.INDEX_BATCH_CHUNK
         session = self.get_session()
+        
+        def attempt(part: List[Dict[str, Any]]) -> bool:
+            try:
+                if len(part) == 1:
+                    changed = self._upsert_row(session, part[0])
+                else:
+                    changed = self._upsert_rows(session, part)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                print(f"❌ Error indexing {len(part)} file(s) starting at {part[0]['path']}: {e}")
+                return False
+            written.extend(changed)
+            results["success"] += sum(submitted[row["path"]] for row in part)
+            return True
+        
         try:
-            q = session.query(FileIndex)
-            
-            # Text search in summary and key_elements
-            search_filter = text(
-                "(summary ILIKE :query OR "
-                "EXISTS (SELECT 1 FROM json_array_elements_text(key_elements) elem WHERE elem ILIKE :query) OR "
-                "EXISTS (SELECT 1 FROM json_array_elements_text(tags) tag WHERE tag ILIKE :query))"
-            )
-            q = q.filter(search_filter.bindparams(query=f"%{query.query}%"))
-            
-            # Apply filters
-            if query.file_types:
-                q = q.filter(FileIndex.file_type.in_([ft.value for ft in query.file_types]))
-            
-            if query.technologies:
-                q = q.filter(FileIndex.technology.in_([t.value for t in query.technologies]))
-            
-            if query.repos:
-                q = q.filter(FileIndex.repo.in_(query.repos))
-            
-            if query.tags:
-                # Filter by tags (at least one match)
-                tag_filter = text(
-                    "EXISTS (SELECT 1 FROM json_array_elements_text(tags) tag WHERE tag = ANY(:tags))"
-                )
-                q = q.filter(tag_filter.bindparams(tags=query.tags))
-            
-            # Order by most recent
-            q = q.order_by(FileIndex.indexed_at.desc())
-            
-            # Limit results
-            q = q.limit(query.limit)
-            
-            return q.all()
-            
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                if attempt(chunk):
+                    continue
+                for row in chunk:
+                    if len(chunk) == 1 or not attempt([row]):
+                        failed.add(row["path"])
+                        results["failed"] += submitted[row["path"]]
         finally:
             session.close()
+        
+        return results, written, failed
     
-    def get_file_context(self, path: str) -> Optional[FileIndex]:
-        """Get complete context for a specific file"""
-        session = self.get_session()
+    @staticmethod
+    def _upsert_rows(session: Session, rows: List[Dict[str, Any]]) -> List[Row]:
+        """Stage rows in a temp table and merge them into file_index (no commit).
+        
+        Returns the rows written with their stats deltas; rows whose
+        content_hash is unchanged are skipped.
+        """
+        # Re-indexing is repeatable, so trade commit durability for speed
+        session.execute(text("SET LOCAL synchronous_commit = OFF"))
+        session.execute(text(
+            f"CREATE TEMP TABLE {_stage_table.name} ON COMMIT DROP AS "
+            f"SELECT {_STAGE_COLUMNS} FROM file_index WITH NO DATA"
+        ))
+        # COPY streams the whole chunk in one protocol exchange
+        cursor = session.connection().connection.cursor()
         try:
-            return session.query(FileIndex).filter_by(path=path).first()
+            cursor.copy_expert(_STAGE_COPY, DatabaseManager._copy_buffer(rows))
         finally:
-            session.close()
+            cursor.close()
+        return session.execute(text(_STATS_DELTA.format(
+            stage=_stage_table.name,
+            upsert=(
+                f"INSERT INTO file_index ({_STAGE_COLUMNS}, indexed_at) "
+                f"SELECT {_STAGE_COLUMNS}, timezone('utc', now()) FROM {_stage_table.name} "
+                f"ON CONFLICT (path) DO UPDATE SET {_UPSERT_SET} "
+                f"WHERE file_index.content_hash IS DISTINCT FROM EXCLUDED.content_hash"
+            )
+        ))).all()
+    
+    @staticmethod
+    def _copy_buffer(rows: List[Dict[str, Any]]) -> io.StringIO:
+        """CSV text of rows in staging column order, for COPY FROM STDIN"""
+        buffer = io.StringIO()
+        # Quote every field: COPY reads an unquoted empty field as NULL
+        writer = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator="\n")
+        for row in rows:
+            writer.writerow([
+                _json_text(row[c.name]) if c.name in _STAGE_JSON_COLUMNS else row[c.name]
+                for c in _stage_table.columns
+            ])
+        buffer.seek(0)
+        return buffer
+    
+    @staticmethod
+    def _to_row(file_knowledge: FileKnowledge) -> Dict[str, Any]:
+        """Flatten a FileKnowledge into file_index column values"""
+        return {
+            "path": file_knowledge.path,
+            "repo": file_knowledge.repo,
+            "file_type": file_knowledge.file_type,
+            "technology": file_knowledge.technology,
+            "summary": file_knowledge.summary,
+            "key_elements": file_knowledge.key_elements,
+            "dependencies": file_knowledge.dependencies,
+            "dependents": file_knowledge.dependents,
+            "tags": file_knowledge.tags,
+            "content_hash": file_knowledge.content_hash,
+            "file_metadata": file_knowledge.file_metadata,
+        }
+    
+    # ==================== SEARCH ====================
+    
+    def search_knowledge(self, query: SearchQuery) -> List[Row]:
+        """Search for files matching query"""
+        scope = self._search_scope(query)
+        cached = self._search_cache.get(query.query, scope)
+        if cached is not None:
+            return list(cached)
+        
+        version = self._write_version
+        q, params = self._search_statement(query)
+        with self.session_scope() as session:
+            results = session.execute(q, params).all()
+        
+        # Skip caching if a write landed while the query ran
+        if version == self._write_version:
+            self._search_cache.set(query.query, scope, results)
+        return list(results)
+    
+    def iter_search_knowledge(self, query: SearchQuery, batch_size: int = 500) -> Iterator[Row]:
+        """Search for files matching query, streaming rows from a server-side cursor"""
+        q, params = self._search_statement(query)
+        with self.session_scope() as session:
+            result = session.execute(q.execution_options(yield_per=batch_size), params)
+            yield from result
+    
+    @staticmethod
+    def _search_scope(query: SearchQuery) -> tuple:
+        """Everything besides the query text that determines search results"""
+        return (
+            tuple(sorted(query.file_types or ())),
+            tuple(sorted(query.technologies or ())),
+            tuple(sorted(query.repos or ())),
+            tuple(sorted(query.tags or ())),
+            query.limit,
+        )
+    
+    @staticmethod
+    def _search_statement(query: SearchQuery):
+        """Build the search_knowledge statement and its bind parameters"""
+        q = _SEARCH_STMT
+        
+        # Apply filters
+        if query.file_types:
+            q = q.where(FileIndex.file_type.in_(query.file_types))
+        
+        if query.technologies:
+            q = q.where(FileIndex.technology.in_(query.technologies))
+        
+        if query.repos:
+            q = q.where(FileIndex.repo.in_(query.repos))
+        
+        if query.tags:
+            # Filter by tags (at least one match), each term served by idx_tags_gin
+            q = q.where(or_(*(FileIndex.tags.contains([tag]) for tag in query.tags)))
+        
+        q = q.limit(query.limit)
+        
+        # Matching is case-insensitive, so cache keys and SQL share one normal form
+        terms = normalize_query(query.query)
+        return q, {"terms": terms, "pattern": f"%{terms}%"}
+    
+    def cached_file_context(self, path: str) -> Optional[FileIndex]:
+        """Cached context for a file, or None on a miss (never queries)"""
+        return self._read_cache.get(("file_context", self._write_version, path))
+    
+    def get_file_contexts(self, paths: List[str]) -> Dict[str, FileIndex]:
+        """Get complete context for several files in one query (found paths only)"""
+        version = self._write_version
+        results = {}
+        missing = []
+        for path in paths:
+            cached = self._read_cache.get(("file_context", version, path))
+            if cached is not None:
+                results[path] = cached
+            else:
+                missing.append(path)
+        if not missing:
+            return results
+        
+        with self.session_scope() as session:
+            for file_index in session.scalars(
+                select(FileIndex).where(FileIndex.path.in_(missing))
+            ):
+                results[file_index.path] = file_index
+                self._read_cache.set(("file_context", version, file_index.path), file_index)
+        return results
+    
+    def warm_file_contexts(self, limit: int) -> int:
+        """Load the most recently indexed files into the read cache; returns how many"""
+        if limit <= 0:
+            return 0
+        with self.session_scope() as session:
+            paths = session.scalars(
+                select(FileIndex.path).order_by(FileIndex.indexed_at.desc()).limit(limit)
+            ).all()
+        return len(self.get_file_contexts(paths))
     
     def find_related(self, path: str, limit: int = 10) -> List[FileIndex]:
         """Find files related to the given path"""
-        session = self.get_session()
-        try:
-            # Get the source file
-            source = session.query(FileIndex).filter_by(path=path).first()
-            if not source:
-                return []
-            
-            # Find files with similar tags or in same repo
-            q = session.query(FileIndex).filter(
-                FileIndex.path != path
+        key = ("find_related", self._write_version, path, limit)
+        cached = self._read_cache.get(key)
+        if cached is not None:
+            return list(cached)
+        
+        with self.session_scope() as session:
+            # Resolve the source file inside the same statement
+            source = (
+                select(FileIndex.repo, FileIndex.technology)
+                .where(FileIndex.path == path)
+                .cte("source")
             )
             
-            # Same repo
-            q = q.filter(FileIndex.repo == source.repo)
-            
-            # Order by same technology first, then by date
-            q = q.order_by(
-                (FileIndex.technology == source.technology).desc(),
-                FileIndex.indexed_at.desc()
+            # Same repo, same technology first, then by date
+            q = (
+                select(FileIndex)
+                .join(source, FileIndex.repo == source.c.repo)
+                .where(FileIndex.path != path)
+                .order_by(
+                    FileIndex.technology != source.c.technology,
+                    FileIndex.indexed_at.desc()
+                )
+                .limit(limit)
             )
             
-            return q.limit(limit).all()
-            
-        finally:
-            session.close()
+            results = session.scalars(q).all()
+            self._read_cache.set(key, results)
+            return list(results)
     
     def search_by_type(
         self,
         file_type: str,
         repo: Optional[str] = None,
         limit: int = 50
-    ) -> List[FileIndex]:
+    ) -> List[Row]:
         """Search files by type"""
-        session = self.get_session()
-        try:
-            q = session.query(FileIndex).filter_by(file_type=file_type)
+        if file_type not in _FILE_TYPE_LABELS:
+            return []
+        
+        key = ("search_by_type", self._write_version, file_type, repo, limit)
+        cached = self._read_cache.get(key)
+        if cached is not None:
+            return list(cached)
+        
+        with self.session_scope() as session:
+            q = select(*_LISTING_COLUMNS).where(FileIndex.file_type == file_type)
             
             if repo:
-                q = q.filter_by(repo=repo)
-            
-            q = q.order_by(FileIndex.indexed_at.desc())
-            return q.limit(limit).all()
+                q = q.where(FileIndex.repo == repo)
             
-        finally:
-            session.close()
+            q = q.order_by(FileIndex.indexed_at.desc()).limit(limit)
+            results = session.execute(q).all()
+            self._read_cache.set(key, results)
+            return list(results)
     
     # ==================== ANALYSIS ====================
     
+    def ping(self) -> None:
+        """Round-trip a trivial query; raises if the database is unreachable"""
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    
+    def cached_stats(self) -> Optional[IndexStats]:
+        """Last known stats, without querying the database"""
+        return self._stats.peek()
+    
     def get_stats(self) -> IndexStats:
-        """Get statistics about indexed knowledge"""
-        session = self.get_session()
-        try:
-            total = session.query(FileIndex).count()
-            
-            # Files by type
-            by_type = {}
-            for row in session.query(
-                FileIndex.file_type,
-                text("COUNT(*) as count")
-            ).group_by(FileIndex.file_type).all():
-                by_type[row.file_type] = row.count
-            
-            # Files by repo
-            by_repo = {}
-            for row in session.query(
-                FileIndex.repo,
-                text("COUNT(*) as count")
-            ).group_by(FileIndex.repo).all():
-                by_repo[row.repo] = row.count
-            
-            # Files by technology
-            by_tech = {}
-            for row in session.query(
-                FileIndex.technology,
-                text("COUNT(*) as count")
-            ).group_by(FileIndex.technology).all():
-                by_tech[row.technology] = row.count
-            
-            # Last indexed
-            last = session.query(FileIndex.indexed_at).order_by(
-                FileIndex.indexed_at.desc()
-            ).first()
+        """Get statistics about indexed knowledge.
+        
+        Served from counters that local writes keep current; the aggregate
+        query only runs to (re)build them.
+        """
+        stats = self._stats.get()
+        if stats is not None:
+            return stats
+        
+        version = self._write_version
+        with self.session_scope() as session:
+            # One statement, one scan: a grouping set per breakdown plus the grand total
+            dimensions = (FileIndex.file_type, FileIndex.repo, FileIndex.technology)
+            rows = session.execute(
+                select(
+                    *dimensions,
+                    func.grouping(*dimensions).label("grouping"),
+                    func.count().label("files"),
+                    func.coalesce(func.sum(FileIndex.deps_count), 0).label("deps"),
+                    func.max(FileIndex.indexed_at).label("last_indexed")
+                ).group_by(func.grouping_sets(*dimensions, tuple_()))
+            ).all()
             
-            # Total dependencies (handle potential column issues gracefully)
-            try:
-                total_deps = session.query(
-                    text("SUM(json_array_length(dependencies)) as total")
-                ).scalar() or 0
-            except Exception:
-                # Fallback if json_array_length doesn't work
-                total_deps = 0
+            # GROUPING() sets a bit for each dimension rolled up (file_type is the high bit)
+            by_type, by_repo, by_tech = {}, {}, {}
+            total, total_deps, last = 0, 0, None
+            for row in rows:
+                if row.grouping == 0b011:
+                    by_type[row.file_type] = row.files
+                elif row.grouping == 0b101:
+                    by_repo[row.repo] = row.files
+                elif row.grouping == 0b110:
+                    by_tech[row.technology] = row.files
+                else:
+                    total, total_deps, last = row.files, row.deps, row.last_indexed
             
-            return IndexStats(
+            stats = IndexStats(
                 total_files=total,
                 files_by_type=by_type,
                 files_by_repo=by_repo,
                 files_by_technology=by_tech,
-                last_indexed=last[0] if last else None,
+                last_indexed=last,
                 total_dependencies=total_deps
             )
-            
-        finally:
-            session.close()
+        
+        # A write that committed while the query ran may be missing from it
+        with self._write_lock:
+            if version == self._write_version:
+                self._stats.load(stats)
+        return stats
     
     def analyze_dependencies(self, path: str, max_depth: int = 3) -> DependencyGraph:
-        """Analyze dependency graph for a file"""
-        session = self.get_session()
-        try:
-            file = session.query(FileIndex).filter_by(path=path).first()
-            if not file:
+        """Analyze dependency graph for a file, following dependencies up to max_depth"""
+        key = ("dependencies", self._write_version, path, max_depth)
+        cached = self._read_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        with self.session_scope() as session:
+            dependents = session.execute(
+                select(FileIndex.dependents).where(FileIndex.path == path)
+            ).scalar_one_or_none()
+            if dependents is None:
                 raise ValueError(f"File not found: {path}")
             
-            # Get direct dependencies and dependents
-            dependencies = file.dependencies or []
-            dependents = file.dependents or []
+            # Whole traversal in one statement, each path at its shallowest depth
+            rows = session.execute(
+                _DEPENDENCY_TREE, {"root": path, "max_depth": max_depth}
+            ).all()
             
-            return DependencyGraph(
+            graph = DependencyGraph(
                 root=path,
-                dependencies=dependencies,
+                dependencies=[row.path for row in rows],
                 dependents=dependents,
-                depth=1  # TODO: Implement recursive depth analysis
+                depth=max((row.depth for row in rows), default=0)
             )
-            
-        finally:
-            session.close()
-
+            self._read_cache.set(key, graph)
+            return graph
 
 # Global database manager instance
 db = DatabaseManager()
@@ -0,0 +1,70 @@
+"""
+JSON schema examples for Emperion Knowledge Base models
+
+Imported only when a schema is generated (OpenAPI, tool discovery), so the
+example payloads never load on the request path.
+"""
+
+EXAMPLES = {
+    "FileKnowledge": {
+        "path": "/emperion/azure-iac/main.bicep",
+        "repo": "azure-iac",
+        "file_type": "bicep",
+        "technology": "infrastructure-as-code",
+        "summary": "Main infrastructure definition for Azure resources",
+        "key_elements": [
+            "storageAccount",
+            "appServicePlan",
+            "keyVault"
+        ],
+        "dependencies": [
+            "/emperion/azure-iac/modules/storage.bicep",
+            "/emperion/azure-iac/modules/keyvault.bicep"
+        ],
+        "dependents": [],
+        "tags": ["azure", "infrastructure", "production"],
+        "content_hash": "abc123def456",
+        "indexed_at": "2025-10-29T18:00:00Z",
+        "file_metadata": {
+            "line_count": 150,
+            "complexity": "medium",
+            "last_modified": "2025-10-28"
+        }
+    },
+    "BatchIndexRequest": {
+        "files": [
+            {
+                "path": "/emperion/azure-iac/main.bicep",
+                "repo": "azure-iac",
+                "file_type": "bicep",
+                "technology": "infrastructure-as-code",
+                "summary": "Main infrastructure",
+                "key_elements": ["storage", "keyvault"],
+                "dependencies": [],
+                "dependents": [],
+                "tags": ["azure"],
+                "content_hash": "abc123",
+                "file_metadata": {}
+            }
+        ]
+    },
+    "SearchQuery": {
+        "query": "azure storage configuration",
+        "file_types": ["bicep"],
+        "technologies": ["infrastructure-as-code"],
+        "repos": ["azure-iac"],
+        "tags": ["production"],
+        "limit": 10
+    },
+    "DependencyGraph": {
+        "root": "/emperion/IntakeAPI/Services/AuthService.cs",
+        "dependencies": [
+            "/emperion/IntakeAPI/Models/User.cs",
+            "/emperion/IntakeAPI/Interfaces/IAuthService.cs"
+        ],
+        "dependents": [
+            "/emperion/IntakeAPI/Controllers/AuthController.cs"
+        ],
+        "depth": 2
+    },
+}
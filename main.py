@@ -4,113 +4,282 @@ Emperion Knowledge Base - Remote MCP Server with FastMCP
 Streamable HTTP transport for DigitalOcean App Platform
 """
 
+import asyncio
+import atexit
 import logging
 import os
-from typing import List, Dict, Any
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from operator import attrgetter
+from typing import List, Dict, Any, Optional
 from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
 
+import orjson
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response, StreamingResponse
 from fastmcp import FastMCP
+from pydantic import TypeAdapter, ValidationError
 
+import toon
+from cache import TTLCache
+from coalescer import BatchCoalescer
 from database import db
 from models import (
-    FileKnowledge, SearchQuery, FileType, Technology,
+    FileKnowledge, BatchIndexRequest, SearchQuery, FileType, Technology,
     DependencyGraph, IndexStats
 )
 from config import config
 
-# Setup logging
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+try:
+    import msgpack
+except ImportError:  # optional: binary /search/stream responses
+    msgpack = None
+
+try:
+    from starlette_prometheus import PrometheusMiddleware, metrics
+except ImportError:  # optional: per-path request metrics at /metrics
+    PrometheusMiddleware = metrics = None
+
+# Setup logging: callers only enqueue records, a listener thread writes them
+_log_queue = queue.SimpleQueue()
+_log_output = logging.StreamHandler()
+_log_output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+_log_input = QueueHandler(_log_queue)
+# The listener's handler applies the full format; the queued message stays bare
+_log_input.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=getattr(logging, config.LOG_LEVEL), handlers=[_log_input])
+# Started at import (not in the lifespan) so the __main__ banner of a
+# multi-worker parent process is written too; stopping flushes the queue
+_log_listener = QueueListener(_log_queue, _log_output)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (datetimes serialize natively)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+class ServerTimingMiddleware:
+    """Add a Server-Timing header with the time spent before the response started.
+
+    For streamed responses (SSE, /search/stream) that is time to first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = (time.perf_counter() - start) * 1000
+                message["headers"] = [
+                    *message.get("headers", []), (b"server-timing", b"app;dur=%.1f" % elapsed)
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
+
+
+class UncompressedPathsGZipMiddleware:
+    """GZipMiddleware for every path except `uncompressed`.
+
+    GZipMiddleware never flushes its compressor mid-response, so streamed
+    bodies on those paths would reach gzip clients only once complete.
+    """
+
+    def __init__(self, app, uncompressed: tuple[str, ...], **gzip_options):
+        self.app = app
+        self.gzip = GZipMiddleware(app, **gzip_options)
+        self.uncompressed = frozenset(uncompressed)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.uncompressed:
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
+
+
+# Fields returned per record by the listing tools
+_SEARCH_FIELDS = ("path", "repo", "file_type", "technology", "summary", "tags", "key_elements")
+_RELATED_FIELDS = ("path", "repo", "file_type", "technology", "summary", "tags")
+_TYPE_FIELDS = ("path", "repo", "summary", "technology", "tags", "indexed_at")
+_CONTEXT_FIELDS = (
+    "path", "repo", "file_type", "technology", "summary", "key_elements",
+    "dependencies", "dependents", "tags", "content_hash", "indexed_at", "file_metadata"
+)
+_CONTEXT_GET = attrgetter(*_CONTEXT_FIELDS)
+
+
+def _records(rows, fields: tuple) -> List[dict]:
+    """Build one dict per row from the given attribute names"""
+    get = attrgetter(*fields)
+    return [dict(zip(fields, get(r))) for r in rows]
+
+
+def _listing(records: List[dict]) -> dict:
+    """Standard listing tool response"""
+    return {"results": records, "count": len(records)}
+
+
+def _listing_error(e: Exception) -> dict:
+    """Empty listing carrying the error"""
+    return {"results": [], "count": 0, "error": str(e)}
+
+
+def _serialize_result(data: Any) -> str:
+    """Compact orjson text for tool results (FastMCP's default is indented JSON),
+    or TOON when TOOL_RESULT_FORMAT=toon.
+    
+    Datetimes are left to orjson, which writes the same ISO 8601 text as isoformat().
+    """
+    if config.TOOL_RESULT_FORMAT == "toon":
+        return toon.encode(data)
+    return orjson.dumps(data, default=str).decode()
+
 # ==================== FASTMCP SERVER ====================
 
-mcp = FastMCP("emperion-knowledge-base")
+mcp = FastMCP("emperion-knowledge-base", tool_serializer=_serialize_result)
+
+# Concurrent get_file_context calls share one "path IN (...)" query
+_context_coalescer = BatchCoalescer(db.get_file_contexts)
+# index_file calls arriving within 20 ms are merged into one staged upsert
+_index_coalescer = BatchCoalescer(db.index_files, max_batch=100, max_wait=0.02)
+# Validated files by (path, content_hash), with the payload they came from;
+# models are frozen, so a re-index sending the same payload reuses the instance
+_validated_files = TTLCache(maxsize=config.VALIDATED_FILE_CACHE_SIZE, ttl=float("inf"))
+
+
+# Keyed by position so validation errors name the file's index in the request
+_FILES_ADAPTER = TypeAdapter(Dict[int, FileKnowledge])
+
+
+def _cache_key(payload: Dict[str, Any]) -> Optional[tuple]:
+    """(path, content_hash) of a payload, or None if either is not a string"""
+    path, content_hash = payload.get("path"), payload.get("content_hash")
+    if isinstance(path, str) and isinstance(content_hash, str):
+        return path, content_hash
+    return None
+
+
+def _validate_files(payloads: List[Dict[str, Any]], offset: int = 0) -> List[FileKnowledge]:
+    """FileKnowledge for each payload, reusing repeated payloads and
+    validating the rest in a single pydantic-core call (errors are
+    reported at offset + the payload's index)"""
+    files: List[Optional[FileKnowledge]] = [None] * len(payloads)
+    misses = {}
+    for i, payload in enumerate(payloads):
+        key = _cache_key(payload)
+        cached = _validated_files.get(key) if key else None
+        if cached is not None and cached[0] == payload:
+            files[i] = cached[1]
+        else:
+            misses[offset + i] = payload
+    
+    if misses:
+        for i, fk in _FILES_ADAPTER.validate_python(misses).items():
+            files[i - offset] = fk
+            key = _cache_key(misses[i])
+            if key:
+                _validated_files.set(key, (misses[i], fk))
+    return files
+
+
+async def _avalidate_files(payloads: List[Dict[str, Any]]) -> List[FileKnowledge]:
+    """_validate_files in INDEX_BATCH_CHUNK slices, yielding to the event
+    loop between them so a huge batch doesn't stall concurrent requests"""
+    files: List[FileKnowledge] = []
+    for start in range(0, len(payloads), config.INDEX_BATCH_CHUNK):
+        if start:
+            await asyncio.sleep(0)
+        files += _validate_files(payloads[start:start + config.INDEX_BATCH_CHUNK], start)
+    return files
 
 # ==================== MCP TOOLS ====================
+# Tool logs use lazy %-formatting (skipped when the level is disabled), with
+# client-supplied strings and error messages capped via %.Ns
 
 @mcp.tool()
-def index_file(
+async def index_file(
     path: str,
     repo: str,
     file_type: str,
     technology: str,
     summary: str,
     content_hash: str,
-    key_elements: List[str] = [],
-    dependencies: List[str] = [],
-    tags: List[str] = [],
-    file_metadata: Dict[str, Any] = {}
+    key_elements: Optional[List[str]] = None,
+    dependencies: Optional[List[str]] = None,
+    tags: Optional[List[str]] = None,
+    file_metadata: Optional[Dict[str, Any]] = None
 ) -> dict:
     """Index a single file's structured knowledge."""
     try:
-        fk = FileKnowledge(
-            path=path,
-            repo=repo,
-            file_type=FileType(file_type),
-            technology=Technology(technology),
-            summary=summary,
-            content_hash=content_hash,
-            key_elements=key_elements,
-            dependencies=dependencies,
-            dependents=[],
-            tags=tags,
-            file_metadata=file_metadata
-        )
-        success = db.index_file(fk)
+        fk, = _validate_files([{
+            "path": path,
+            "repo": repo,
+            "file_type": file_type,
+            "technology": technology,
+            "summary": summary,
+            "content_hash": content_hash,
+            "key_elements": key_elements or [],
+            "dependencies": dependencies or [],
+            "dependents": [],
+            "tags": tags or [],
+            "file_metadata": file_metadata or {}
+        }])
+        success = await _index_coalescer.submit(fk.path, fk)
         
         if success:
-            logger.info(f"✅ Indexed: {path}")
+            logger.info("✅ Indexed: %.500s", path)
             return {"status": "success", "path": path}
         else:
-            logger.error(f"❌ Failed to index: {path}")
+            logger.error("❌ Failed to index: %.500s", path)
             return {"status": "error", "path": path, "message": "Database operation failed"}
             
     except ValueError as e:
-        logger.error(f"❌ Invalid input for {path}: {e}")
+        logger.error("❌ Invalid input for %.500s: %.500s", path, e)
         return {"status": "error", "path": path, "message": str(e)}
     except Exception as e:
-        logger.error(f"❌ Unexpected error indexing {path}: {e}")
+        logger.error("❌ Unexpected error indexing %.500s: %.500s", path, e)
         return {"status": "error", "path": path, "message": f"Unexpected error: {str(e)}"}
 
 
 @mcp.tool()
-def index_batch(files: List[Dict[str, Any]]) -> dict:
+async def index_batch(files: List[Dict[str, Any]]) -> dict:
     """Index multiple files."""
     try:
-        file_objects = []
-        for f in files:
-            fk = FileKnowledge(
-                path=f["path"],
-                repo=f["repo"],
-                file_type=FileType(f["file_type"]),
-                technology=Technology(f["technology"]),
-                summary=f["summary"],
-                content_hash=f["content_hash"],
-                key_elements=f.get("key_elements", []),
-                dependencies=f.get("dependencies", []),
-                dependents=[],
-                tags=f.get("tags", []),
-                file_metadata=f.get("file_metadata", {})
-            )
-            file_objects.append(fk)
+        # Dependents are derived, never taken from the client
+        payload = [{**f, "dependents": []} for f in files]
+        if config.TRUST_INDEX_PAYLOADS:
+            batch = BatchIndexRequest.construct_trusted(payload)
+        else:
+            batch = BatchIndexRequest.model_construct(files=await _avalidate_files(payload))
         
-        results = db.index_batch(file_objects)
-        logger.info(f"📦 Batch indexed: {results['success']} success, {results['failed']} failed")
+        results = await db.aindex_batch(batch.files)
+        logger.info("📦 Batch indexed: %d success, %d failed", results["success"], results["failed"])
         return results
         
     except Exception as e:
-        logger.error(f"❌ Batch index error: {e}")
+        logger.error("❌ Batch index error: %.500s", e)
         return {"success": 0, "failed": len(files), "error": str(e)}
 
 
 @mcp.tool()
-def search_knowledge(
+async def search_knowledge(
     query: str,
     limit: int = 10,
     file_types: List[str] = None,
@@ -120,145 +289,111 @@ def search_knowledge(
 ) -> dict:
     """Search files."""
     try:
-        search_query = SearchQuery(
-            query=query,
-            limit=min(limit, 100),
-            file_types=[FileType(ft) for ft in file_types] if file_types else None,
-            technologies=[Technology(t) for t in technologies] if technologies else None,
-            repos=repos,
-            tags=tags
-        )
+        search_query = SearchQuery.model_validate({
+            "query": query,
+            "limit": min(limit, 100),
+            "file_types": file_types or None,
+            "technologies": technologies or None,
+            "repos": repos,
+            "tags": tags
+        })
         
-        results = db.search_knowledge(search_query)
-        formatted = [
-            {
-                "path": r.path,
-                "repo": r.repo,
-                "file_type": r.file_type,
-                "technology": r.technology,
-                "summary": r.summary,
-                "tags": r.tags,
-                "key_elements": r.key_elements
-            }
-            for r in results
-        ]
+        formatted = _records(
+            await asyncio.to_thread(db.search_knowledge, search_query), _SEARCH_FIELDS
+        )
         
-        logger.info(f"🔍 Search '{query}' returned {len(formatted)} results")
-        return {"results": formatted, "count": len(formatted)}
+        logger.info("🔍 Search '%.200s' returned %d results", query, len(formatted))
+        return _listing(formatted)
         
     except Exception as e:
-        logger.error(f"❌ Search error: {e}")
-        return {"results": [], "count": 0, "error": str(e)}
+        logger.error("❌ Search error: %.500s", e)
+        return _listing_error(e)
 
 
 @mcp.tool()
-def get_file_context(path: str) -> dict:
-    """Get file context."""
+async def get_file_context(path: str, known_hash: Optional[str] = None) -> dict:
+    """Get file context. Pass the content_hash you already hold as known_hash to get a short 'unchanged' reply."""
     try:
-        result = db.get_file_context(path)
+        # Cache hits answer at once; only misses wait for the coalesced query
+        result = db.cached_file_context(path)
+        if result is None:
+            result = await _context_coalescer.submit(path)
         
         if result:
-            logger.info(f"📄 Retrieved context for: {path}")
-            return {
-                "path": result.path,
-                "repo": result.repo,
-                "file_type": result.file_type,
-                "technology": result.technology,
-                "summary": result.summary,
-                "key_elements": result.key_elements,
-                "dependencies": result.dependencies,
-                "dependents": result.dependents,
-                "tags": result.tags,
-                "content_hash": result.content_hash,
-                "indexed_at": result.indexed_at.isoformat(),
-                "file_metadata": result.file_metadata
-            }
+            if known_hash is not None and known_hash == result.content_hash:
+                logger.info("📄 Context unchanged for: %.500s", path)
+                return {"path": path, "unchanged": True, "content_hash": known_hash}
+            
+            logger.info("📄 Retrieved context for: %.500s", path)
+            return dict(zip(_CONTEXT_FIELDS, _CONTEXT_GET(result)))
         else:
-            logger.warning(f"⚠️  File not found: {path}")
+            logger.warning("⚠️  File not found: %.500s", path)
             return {"error": "not_found", "path": path}
             
     except Exception as e:
-        logger.error(f"❌ Error getting context for {path}: {e}")
+        logger.error("❌ Error getting context for %.500s: %.500s", path, e)
         return {"error": str(e), "path": path}
 
 
 @mcp.tool()
-def find_related(path: str, limit: int = 10) -> dict:
+async def find_related(path: str, limit: int = 10) -> dict:
     """Find related files."""
     try:
-        results = db.find_related(path, min(limit, 50))
-        formatted = [
-            {
-                "path": r.path,
-                "repo": r.repo,
-                "file_type": r.file_type,
-                "technology": r.technology,
-                "summary": r.summary,
-                "tags": r.tags
-            }
-            for r in results
-        ]
+        formatted = _records(
+            await asyncio.to_thread(db.find_related, path, min(limit, 50)), _RELATED_FIELDS
+        )
         
-        logger.info(f"🔗 Found {len(formatted)} related files for: {path}")
-        return {"results": formatted, "count": len(formatted)}
+        logger.info("🔗 Found %d related files for: %.500s", len(formatted), path)
+        return _listing(formatted)
         
     except Exception as e:
-        logger.error(f"❌ Error finding related files for {path}: {e}")
-        return {"results": [], "count": 0, "error": str(e)}
+        logger.error("❌ Error finding related files for %.500s: %.500s", path, e)
+        return _listing_error(e)
 
 
 @mcp.tool()
-def search_by_type(file_type: str, repo: str = None, limit: int = 50) -> dict:
+async def search_by_type(file_type: str, repo: str = None, limit: int = 50) -> dict:
     """Search by file type."""
     try:
-        results = db.search_by_type(file_type, repo, min(limit, 100))
-        formatted = [
-            {
-                "path": r.path,
-                "repo": r.repo,
-                "summary": r.summary,
-                "technology": r.technology,
-                "tags": r.tags,
-                "indexed_at": r.indexed_at.isoformat()
-            }
-            for r in results
-        ]
+        formatted = _records(
+            await asyncio.to_thread(db.search_by_type, file_type, repo, min(limit, 100)), _TYPE_FIELDS
+        )
         
-        logger.info(f"📁 Found {len(formatted)} files of type '{file_type}'")
-        return {"results": formatted, "count": len(formatted)}
+        logger.info("📁 Found %d files of type '%.100s'", len(formatted), file_type)
+        return _listing(formatted)
         
     except Exception as e:
-        logger.error(f"❌ Error searching by type '{file_type}': {e}")
-        return {"results": [], "count": 0, "error": str(e)}
+        logger.error("❌ Error searching by type '%.100s': %.500s", file_type, e)
+        return _listing_error(e)
 
 
 @mcp.tool()
-def get_stats() -> dict:
+async def get_stats() -> dict:
     """Get statistics."""
     try:
-        stats = db.get_stats()
+        stats = await asyncio.to_thread(db.get_stats)
         result = {
             "total_files": stats.total_files,
             "files_by_type": stats.files_by_type,
             "files_by_repo": stats.files_by_repo,
             "files_by_technology": stats.files_by_technology,
             "total_dependencies": stats.total_dependencies,
-            "last_indexed": stats.last_indexed.isoformat() if stats.last_indexed else None
+            "last_indexed": stats.last_indexed
         }
         
-        logger.info(f"📊 Stats: {stats.total_files} total files")
+        logger.info("📊 Stats: %d total files", stats.total_files)
         return result
         
     except Exception as e:
-        logger.error(f"❌ Error getting stats: {e}")
+        logger.error("❌ Error getting stats: %.500s", e)
         return {"error": str(e)}
 
 
 @mcp.tool()
-def analyze_dependencies(path: str) -> dict:
+async def analyze_dependencies(path: str, max_depth: int = 3) -> dict:
     """Analyze dependencies."""
     try:
-        deps = db.analyze_dependencies(path)
+        deps = await asyncio.to_thread(db.analyze_dependencies, path, min(max(max_depth, 1), config.MAX_DEPENDENCY_DEPTH))
         result = {
             "root": deps.root,
             "dependencies": deps.dependencies,
@@ -268,44 +403,180 @@ def analyze_dependencies(path: str) -> dict:
             "total_dependents": len(deps.dependents)
         }
         
-        logger.info(f"🔀 Analyzed dependencies for: {path}")
+        logger.info("🔀 Analyzed dependencies for: %.500s", path)
         return result
         
     except ValueError as e:
-        logger.warning(f"⚠️  {e}")
+        logger.warning("⚠️  %.500s", e)
         return {"error": str(e), "path": path}
     except Exception as e:
-        logger.error(f"❌ Error analyzing dependencies for {path}: {e}")
+        logger.error("❌ Error analyzing dependencies for %.500s: %.500s", path, e)
         return {"error": str(e), "path": path}
 
 
+# Tools batch_execute may dispatch to. Calls go through a TypeAdapter over the
+# tool function, as FastMCP's own FunctionTool.run does, so batched arguments
+# are validated and coerced exactly like direct calls
+_BATCH_TOOLS = {
+    tool.name: TypeAdapter(tool.fn)
+    for tool in (
+        index_file, index_batch, search_knowledge, get_file_context,
+        find_related, search_by_type, get_stats, analyze_dependencies
+    )
+}
+
+
+# Per-request caps for batch_execute: operations run, and run at once
+_BATCH_MAX_OPERATIONS = 100
+_BATCH_MAX_CONCURRENT = 16
+
+
+def _is_error(result: dict) -> bool:
+    """Whether a tool result reports a failure"""
+    return "error" in result or result.get("status") == "error"
+
+
+@mcp.tool()
+async def batch_execute(
+    operations: List[Dict[str, Any]],
+    max_concurrent: int = 8,
+    stop_on_error: bool = False
+) -> dict:
+    """Run up to 100 tool calls in one request. Each operation is {"tool": name, "arguments": {...}}."""
+    semaphore = asyncio.Semaphore(min(max(max_concurrent, 1), _BATCH_MAX_CONCURRENT))
+    failed = asyncio.Event()
+    
+    async def dispatch(op: Dict[str, Any]) -> dict:
+        name = op.get("tool")
+        adapter = _BATCH_TOOLS.get(name)
+        if adapter is None:
+            failed.set()
+            return {"tool": name, "error": "unknown_tool"}
+        
+        async with semaphore:
+            if stop_on_error and failed.is_set():
+                return {"tool": name, "error": "skipped"}
+            try:
+                call = adapter.validate_python(op.get("arguments") or {})
+            except ValidationError as e:
+                # Missing, unexpected or mistyped arguments
+                result = {"error": str(e)}
+            else:
+                result = await call
+        
+        if _is_error(result):
+            failed.set()
+        return {"tool": name, "result": result}
+    
+    results = await asyncio.gather(*(dispatch(op) for op in operations[:_BATCH_MAX_OPERATIONS]))
+    # Operations past the cap are reported, not silently dropped
+    results.extend(
+        {"tool": op.get("tool"), "error": f"skipped: batch limit {_BATCH_MAX_OPERATIONS}"}
+        for op in operations[_BATCH_MAX_OPERATIONS:]
+    )
+    logger.info("🧺 Batch executed %d operations", min(len(operations), _BATCH_MAX_OPERATIONS))
+    return {"results": results, "count": len(results)}
+
+
 # ==================== CUSTOM ROUTES ====================
+# Registered on the FastAPI app (see APP SETUP) so they resolve in its own
+# router instead of falling through to the FastMCP mount
+
+# Healthy /health bodies are reused for HEALTH_CACHE_TTL seconds, so probes
+# arriving together share one database ping
+_health_cache = TTLCache(maxsize=1, ttl=config.HEALTH_CACHE_TTL)
+
 
-@mcp.custom_route("/health", methods=["GET"])
 async def health_check(request: Request):
-    """Health check for DigitalOcean"""
+    """Health check for DigitalOcean (a cheap ping, no aggregation)"""
+    body = _health_cache.get("healthy")
+    if body is not None:
+        return Response(body, media_type="application/json")
+    
     try:
-        stats = db.get_stats()
-        return JSONResponse({
+        await asyncio.to_thread(db.ping)
+        stats = db.cached_stats()
+        body = orjson.dumps({
             "status": "healthy",
             "server": "emperion-knowledge-base",
             "version": "2.0.5",
             "protocol": "MCP Streamable HTTP",
-            "total_files": stats.total_files,
+            "total_files": stats.total_files if stats else None,
             "database": "connected"
         })
+        _health_cache.set("healthy", body)
+        return Response(body, media_type="application/json")
     except Exception as e:
-        logger.error(f"❌ Health check failed: {e}")
-        return JSONResponse({
+        logger.error("❌ Health check failed: %.500s", e)
+        return ORJSONResponse({
             "status": "unhealthy",
             "error": str(e)
         }, status_code=500)
 
 
+async def search_stream(request: Request):
+    """search_knowledge as NDJSON, one record per line straight off a server-side cursor.
+    
+    Query string: q, limit (up to 100), and repeatable file_type, technology,
+    repo and tag filters. Clients sending Accept: application/msgpack get a
+    stream of MessagePack maps instead (when msgpack is installed).
+    """
+    params = request.query_params
+    try:
+        search_query = SearchQuery.model_validate({
+            "query": params.get("q", ""),
+            "limit": min(int(params.get("limit", 100)), 100),
+            "file_types": params.getlist("file_type") or None,
+            "technologies": params.getlist("technology") or None,
+            "repos": params.getlist("repo") or None,
+            "tags": params.getlist("tag") or None
+        })
+    except ValueError as e:
+        return ORJSONResponse({"error": str(e)}, status_code=400)
+    
+    get = attrgetter(*_SEARCH_FIELDS)
+    
+    if msgpack is not None and "application/msgpack" in request.headers.get("accept", ""):
+        packer = msgpack.Packer()
+        encode, media_type = packer.pack, "application/msgpack"
+    else:
+        encode, media_type = partial(orjson.dumps, option=orjson.OPT_APPEND_NEWLINE), "application/x-ndjson"
+    
+    def records():
+        for row in db.iter_search_knowledge(search_query):
+            yield encode(dict(zip(_SEARCH_FIELDS, get(row))))
+    
+    # Starlette iterates the sync generator in its thread pool
+    return StreamingResponse(records(), media_type=media_type)
+
+
 # ==================== APP SETUP ====================
 
-# Get the ASGI app from FastMCP (Starlette, not FastAPI)
-mcp_app = mcp.http_app(path='/mcp')
+async def _warm_caches() -> None:
+    """Prime the stats counters, recent file contexts and the search cache for WARM_QUERIES"""
+    async def warm_query(query: str) -> None:
+        await asyncio.to_thread(db.search_knowledge, SearchQuery(query=query))
+    
+    start = time.perf_counter()
+    stats, contexts, *queries = await asyncio.gather(
+        asyncio.to_thread(db.get_stats),
+        asyncio.to_thread(db.warm_file_contexts, config.WARM_FILE_CONTEXTS),
+        *(warm_query(q) for q in config.WARM_QUERIES),
+        return_exceptions=True
+    )
+    failed = [o for o in (stats, contexts, *queries) if isinstance(o, Exception)]
+    for e in failed:
+        logger.warning("⚠️  Cache warming failed: %.500s", e)
+    logger.info(
+        "🔥 Warmed caches in %.0f ms (%d queries, %s file contexts, %d failed)",
+        (time.perf_counter() - start) * 1000, len(config.WARM_QUERIES),
+        0 if isinstance(contexts, Exception) else contexts, len(failed)
+    )
+
+
+# Get the ASGI app from FastMCP (Starlette, not FastAPI).
+# MCP sessions live in process memory, so multiple workers need stateless mode
+mcp_app = mcp.http_app(path='/mcp', stateless_http=config.WEB_CONCURRENCY > 1)
 
 # Create FastAPI app with proper lifespan management
 @asynccontextmanager
@@ -315,6 +586,13 @@ async def app_lifespan(app: FastAPI):
     logger.info("📍 Deployment: DigitalOcean App Platform")
     logger.info("🔌 MCP Protocol: Streamable HTTP")
     
+    # asyncio.to_thread runs on the default executor; size it to the DB pool so
+    # excess calls queue here instead of holding threads that wait on a connection
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(
+        max_workers=config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW,
+        thread_name_prefix="db"
+    ))
+    
     try:
         db.init_db()
         logger.info("✅ Database initialized")
@@ -324,9 +602,11 @@ async def app_lifespan(app: FastAPI):
         else:
             logger.warning("⚠️  Configuration has warnings")
     except Exception as e:
-        logger.error(f"❌ Database initialization failed: {e}")
+        logger.error("❌ Database initialization failed: %s", e)
         raise
     
+    await _warm_caches()
+    
     # Enter FastMCP's lifespan context (CRITICAL!)
     async with mcp_app.lifespan(app):
         logger.info("✅ FastMCP lifespan initialized")
@@ -341,26 +621,47 @@ app = FastAPI(
     title="Emperion Knowledge Base",
     description="AI-powered code intelligence MCP server",
     version="2.0.5",
-    lifespan=app_lifespan
+    lifespan=app_lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Static server description, built once at import
+_SERVER_INFO = {
+    "name": "Emperion Knowledge Base",
+    "version": "2.0.5",
+    "status": "online",
+    "protocol": "MCP Streamable HTTP",
+    "mcp_endpoint": "/mcp/",
+    "health_endpoint": "/health",
+    "tools": 9,
+    "note": "MCP server using FastMCP with Streamable HTTP transport"
+}
+
+_SERVER_INFO_JSON = orjson.dumps(_SERVER_INFO)
+
 # Add root endpoint
 @app.get("/")
 async def root():
     """Root endpoint"""
-    return {
-        "name": "Emperion Knowledge Base",
-        "version": "2.0.5",
-        "status": "online",
-        "protocol": "MCP Streamable HTTP",
-        "mcp_endpoint": "/mcp/",
-        "health_endpoint": "/health",
-        "tools": 8,
-        "note": "MCP server using FastMCP with Streamable HTTP transport"
-    }
-
-
-# Mount FastMCP app at root (MCP endpoints will be at /mcp/)
+    return Response(_SERVER_INFO_JSON, media_type="application/json")
+
+
+# Compress JSON bodies of 1 KB and up (repetitive paths and repo names shrink
+# well); text/event-stream is excluded so MCP SSE frames still flush, and
+# /search/stream records must flush as they are produced
+app.add_middleware(
+    UncompressedPathsGZipMiddleware, uncompressed=("/search/stream",), minimum_size=1024
+)
+app.add_middleware(ServerTimingMiddleware)
+if PrometheusMiddleware is not None:
+    app.add_middleware(PrometheusMiddleware)
+    app.add_route("/metrics", metrics)
+
+app.add_route("/health", health_check, methods=["GET"])
+app.add_route("/search/stream", search_stream, methods=["GET"])
+
+# Mount FastMCP app at root (MCP endpoints will be at /mcp/); its lifespan is
+# entered by app_lifespan and its Streamable HTTP route already owns /mcp
 app.mount("/", mcp_app)
 
 
@@ -371,13 +672,18 @@ if __name__ == "__main__":
     
     logger.info("🚀 Starting with uvicorn...")
     logger.info("📡 Transport: Streamable HTTP")
-    logger.info(f"🌐 Server: http://0.0.0.0:{port}")
-    logger.info(f"🔌 MCP Endpoint: http://0.0.0.0:{port}/mcp/")
-    logger.info(f"❤️  Health Check: http://0.0.0.0:{port}/health")
+    logger.info("🌐 Server: http://0.0.0.0:%d", port)
+    logger.info("🔌 MCP Endpoint: http://0.0.0.0:%d/mcp/", port)
+    logger.info("❤️  Health Check: http://0.0.0.0:%d/health", port)
+    logger.info("👷 Workers: %d", config.WEB_CONCURRENCY)
     
+    # Multiple workers require an import string so each process loads the app
     uvicorn.run(
-        app,
+        "main:app" if config.WEB_CONCURRENCY > 1 else app,
         host="0.0.0.0",
         port=port,
+        workers=config.WEB_CONCURRENCY,
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )
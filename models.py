@@ -1,12 +1,21 @@
 """
 Data models for Emperion Knowledge Base
 """
+import sys
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional, List, Dict, Any, Literal
+from pydantic import BaseModel, Field, ConfigDict, field_validator
 from enum import Enum
 
 
+def schema_example(name: str):
+    """json_schema_extra hook adding the model's example, loaded on first schema build"""
+    def add_example(schema: Dict[str, Any]) -> None:
+        from examples import EXAMPLES
+        schema["example"] = EXAMPLES[name]
+    return add_example
+
+
 class FileType(str, Enum):
     """Supported file types"""
     BICEP = "bicep"
@@ -36,122 +45,101 @@ class Technology(str, Enum):
     CONFIG = "configuration"
 
 
+# Field types: pydantic validates a Literal with one set lookup and stores the
+# plain str. Derived from the enums, which also define the database labels
+FileTypeLiteral = Literal[tuple(ft.value for ft in FileType)]
+TechnologyLiteral = Literal[tuple(t.value for t in Technology)]
+
+
 class FileKnowledge(BaseModel):
     """Main knowledge structure for a file"""
     
-    # Pydantic V2: Use ConfigDict instead of Config class
     model_config = ConfigDict(
-        json_schema_extra={
-            "example": {
-                "path": "/emperion/azure-iac/main.bicep",
-                "repo": "azure-iac",
-                "file_type": "bicep",
-                "technology": "infrastructure-as-code",
-                "summary": "Main infrastructure definition for Azure resources",
-                "key_elements": [
-                    "storageAccount",
-                    "appServicePlan",
-                    "keyVault"
-                ],
-                "dependencies": [
-                    "/emperion/azure-iac/modules/storage.bicep",
-                    "/emperion/azure-iac/modules/keyvault.bicep"
-                ],
-                "dependents": [],
-                "tags": ["azure", "infrastructure", "production"],
-                "content_hash": "abc123def456",
-                "indexed_at": "2025-10-29T18:00:00Z",
-                "file_metadata": {
-                    "line_count": 150,
-                    "complexity": "medium",
-                    "last_modified": "2025-10-28"
-                }
-            }
-        }
+        frozen=True,
+        extra="ignore",
+        json_schema_extra=schema_example("FileKnowledge")
     )
     
     # Identity
     path: str = Field(..., description="Full path to the file")
     repo: str = Field(..., description="Repository name")
-    file_type: FileType = Field(..., description="Type of file")
-    technology: Technology = Field(..., description="Technology category")
+    file_type: FileTypeLiteral = Field(..., description="Type of file")
+    technology: TechnologyLiteral = Field(..., description="Technology category")
     
     # Content
     summary: str = Field(..., description="Brief summary of the file purpose")
-    key_elements: List[str] = Field(
-        default_factory=list,
+    key_elements: tuple[str, ...] = Field(
+        default=(),
         description="Important elements (resources, classes, functions)"
     )
     
     # Relationships
-    dependencies: List[str] = Field(
-        default_factory=list,
+    dependencies: tuple[str, ...] = Field(
+        default=(),
         description="Files this one depends on"
     )
-    dependents: List[str] = Field(
-        default_factory=list,
+    dependents: tuple[str, ...] = Field(
+        default=(),
         description="Files that depend on this one"
     )
     
     # Metadata
-    tags: List[str] = Field(default_factory=list, description="Searchable tags")
+    tags: tuple[str, ...] = Field(default=(), description="Searchable tags")
     content_hash: str = Field(..., description="Hash of the content for change detection")
-    indexed_at: datetime = Field(default_factory=datetime.utcnow)
+    indexed_at: Optional[datetime] = Field(None, description="Set by the database on write")
     
     # Additional context
     file_metadata: Dict[str, Any] = Field(
         default_factory=dict,
         description="Extra metadata (line_count, complexity, etc)"
     )
+    
+    @field_validator("key_elements", "dependencies", "dependents", "tags")
+    @classmethod
+    def _intern_strings(cls, value: tuple[str, ...]) -> tuple[str, ...]:
+        """Share one copy of paths and tags repeated across files"""
+        return tuple(map(sys.intern, value))
+    
+    @classmethod
+    def construct_trusted(cls, data: Dict[str, Any]) -> "FileKnowledge":
+        """Build from an already-validated payload, skipping pydantic validation.
+        
+        Fields are taken as given; an unknown file_type or technology is only
+        caught by the database enum on write.
+        """
+        return cls.model_construct(**data)
 
 
 class BatchIndexRequest(BaseModel):
     """Request to index multiple files at once"""
     
     model_config = ConfigDict(
-        json_schema_extra={
-            "example": {
-                "files": [
-                    {
-                        "path": "/emperion/azure-iac/main.bicep",
-                        "repo": "azure-iac",
-                        "file_type": "bicep",
-                        "technology": "infrastructure-as-code",
-                        "summary": "Main infrastructure",
-                        "key_elements": ["storage", "keyvault"],
-                        "dependencies": [],
-                        "dependents": [],
-                        "tags": ["azure"],
-                        "content_hash": "abc123",
-                        "file_metadata": {}
-                    }
-                ]
-            }
-        }
+        frozen=True,
+        extra="ignore",
+        json_schema_extra=schema_example("BatchIndexRequest")
     )
     
     files: List[FileKnowledge] = Field(..., description="List of files to index")
+    
+    @classmethod
+    def construct_trusted(cls, files: List[Dict[str, Any]]) -> "BatchIndexRequest":
+        """Build from already-validated file payloads (see FileKnowledge.construct_trusted)"""
+        construct = FileKnowledge.construct_trusted
+        return cls.model_construct(files=[construct(f) for f in files])
 
 
 class SearchQuery(BaseModel):
     """Search query parameters"""
     
     model_config = ConfigDict(
-        json_schema_extra={
-            "example": {
-                "query": "azure storage configuration",
-                "file_types": ["bicep"],
-                "technologies": ["infrastructure-as-code"],
-                "repos": ["azure-iac"],
-                "tags": ["production"],
-                "limit": 10
-            }
-        }
+        frozen=True,
+        extra="ignore",
+        json_schema_extra=schema_example("SearchQuery")
     )
     
     query: str = Field(..., description="Search query")
-    file_types: Optional[List[FileType]] = Field(None, description="Filter by file types")
-    technologies: Optional[List[Technology]] = Field(None, description="Filter by technology")
+    file_types: Optional[List[FileTypeLiteral]] = Field(None, description="Filter by file types")
+    technologies: Optional[List[TechnologyLiteral]] = Field(None, description="Filter by technology")
     repos: Optional[List[str]] = Field(None, description="Filter by repositories")
     tags: Optional[List[str]] = Field(None, description="Filter by tags")
     limit: int = Field(10, description="Maximum number of results", ge=1, le=100)
@@ -159,6 +147,9 @@ class SearchQuery(BaseModel):
 
 class SearchResult(BaseModel):
     """Search result item"""
+    
+    model_config = ConfigDict(frozen=True)
+    
     file: FileKnowledge
     relevance_score: float = Field(..., description="Relevance score (0-1)")
     matched_elements: List[str] = Field(
@@ -171,29 +162,23 @@ class DependencyGraph(BaseModel):
     """Dependency graph for a component"""
     
     model_config = ConfigDict(
-        json_schema_extra={
-            "example": {
-                "root": "/emperion/IntakeAPI/Services/AuthService.cs",
-                "dependencies": [
-                    "/emperion/IntakeAPI/Models/User.cs",
-                    "/emperion/IntakeAPI/Interfaces/IAuthService.cs"
-                ],
-                "dependents": [
-                    "/emperion/IntakeAPI/Controllers/AuthController.cs"
-                ],
-                "depth": 2
-            }
-        }
+        frozen=True,
+        extra="ignore",
+        json_schema_extra=schema_example("DependencyGraph")
     )
     
     root: str = Field(..., description="Root file path")
-    dependencies: List[str] = Field(..., description="Direct dependencies")
+    dependencies: List[str] = Field(..., description="Dependencies within the analyzed depth, nearest first")
     dependents: List[str] = Field(..., description="Direct dependents")
     depth: int = Field(..., description="Depth of dependency tree")
 
 
 class IndexStats(BaseModel):
     """Statistics about the indexed knowledge"""
+    
+    # Instances are cached and shared between requests
+    model_config = ConfigDict(frozen=True)
+    
     total_files: int
     files_by_type: Dict[str, int]
     files_by_repo: Dict[str, int]
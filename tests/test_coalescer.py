@@ -0,0 +1,145 @@
+"""
+Behaviour of BatchCoalescer (request coalescing for get_file_context/index_file)
+"""
+import asyncio
+import threading
+
+import pytest
+
+from coalescer import BatchCoalescer
+
+
+class RecordingFetch:
+    """fetch stand-in: records each batch and maps item -> item.upper()"""
+
+    def __init__(self, error=None, gate=None):
+        self.batches = []
+        self.error = error
+        self.gate = gate
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {item: item.upper() for item in items}
+
+
+def test_concurrent_calls_share_one_fetch():
+    fetch = RecordingFetch()
+    coalescer = BatchCoalescer(fetch)
+
+    async def main():
+        return await asyncio.gather(*(coalescer.submit(key) for key in ("a", "b", "c")))
+
+    assert asyncio.run(main()) == ["A", "B", "C"]
+    assert fetch.batches == [["a", "b", "c"]]
+
+
+def test_duplicate_keys_are_fetched_once():
+    fetch = RecordingFetch()
+    coalescer = BatchCoalescer(fetch)
+
+    async def main():
+        return await asyncio.gather(coalescer.submit("a"), coalescer.submit("a"))
+
+    assert asyncio.run(main()) == ["A", "A"]
+    assert fetch.batches == [["a"]]
+
+
+def test_last_item_for_a_key_wins():
+    seen = []
+
+    def fetch(items):
+        seen.extend(items)
+        return {"k": items[0]}
+
+    coalescer = BatchCoalescer(fetch)
+
+    async def main():
+        return await asyncio.gather(coalescer.submit("k", "first"), coalescer.submit("k", "second"))
+
+    assert asyncio.run(main()) == ["second", "second"]
+    assert seen == ["second"]
+
+
+def test_missing_keys_resolve_to_none():
+    coalescer = BatchCoalescer(lambda items: {})
+
+    async def main():
+        return await coalescer.submit("a")
+
+    assert asyncio.run(main()) is None
+
+
+def test_max_batch_flushes_without_waiting():
+    fetch = RecordingFetch()
+    coalescer = BatchCoalescer(fetch, max_batch=2, max_wait=60)
+
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(coalescer.submit("a"), coalescer.submit("b")), timeout=5
+        )
+
+    assert asyncio.run(main()) == ["A", "B"]
+    assert fetch.batches == [["a", "b"]]
+
+
+def test_calls_after_a_flush_start_a_new_batch():
+    fetch = RecordingFetch()
+    coalescer = BatchCoalescer(fetch, max_batch=2, max_wait=0.001)
+
+    async def main():
+        return await asyncio.gather(*(coalescer.submit(key) for key in ("a", "b", "c")))
+
+    assert asyncio.run(main()) == ["A", "B", "C"]
+    assert fetch.batches == [["a", "b"], ["c"]]
+
+
+def test_fetch_errors_reach_every_caller():
+    coalescer = BatchCoalescer(RecordingFetch(error=RuntimeError("db down")))
+
+    async def main():
+        return await asyncio.gather(
+            coalescer.submit("a"), coalescer.submit("b"), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+    assert all(str(r) == "db down" for r in results)
+
+
+def test_cancelled_caller_does_not_affect_the_others():
+    gate = threading.Event()
+    fetch = RecordingFetch(gate=gate)
+    coalescer = BatchCoalescer(fetch, max_wait=0.001)
+
+    async def main():
+        cancelled = asyncio.ensure_future(coalescer.submit("a"))
+        kept = asyncio.ensure_future(coalescer.submit("b"))
+        await asyncio.sleep(0.05)  # batch is in flight, blocked on the gate
+        cancelled.cancel()
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await kept
+
+    assert asyncio.run(main()) == "B"
+    assert fetch.batches == [["a", "b"]]
+
+
+def test_in_flight_batches_are_referenced_until_done():
+    gate = threading.Event()
+    coalescer = BatchCoalescer(RecordingFetch(gate=gate), max_wait=0.001)
+
+    async def main():
+        call = asyncio.ensure_future(coalescer.submit("a"))
+        await asyncio.sleep(0.05)
+        in_flight = len(coalescer._tasks)
+        gate.set()
+        await call
+        await asyncio.sleep(0)
+        return in_flight, len(coalescer._tasks)
+
+    assert asyncio.run(main()) == (1, 0)
@@ -0,0 +1,73 @@
+"""
+Concurrency of the write bookkeeping in DatabaseManager (no database needed)
+"""
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+
+from database import DatabaseManager
+from models import IndexStats
+
+THREADS = 8
+WRITES_PER_THREAD = 500
+
+
+def _insert(i: int) -> SimpleNamespace:
+    """A _STATS_DELTA row for a newly inserted path"""
+    return SimpleNamespace(
+        path=f"f{i}", file_type="bicep", repo="azure-iac", technology="infrastructure-as-code",
+        deps_count=2, indexed_at=datetime(2025, 1, 1),
+        old_file_type=None, old_repo=None, old_technology=None, old_deps_count=None
+    )
+
+
+def _run_concurrently(target) -> None:
+    start = threading.Barrier(THREADS)
+
+    def worker(n: int) -> None:
+        start.wait()
+        for i in range(WRITES_PER_THREAD):
+            target(n * WRITES_PER_THREAD + i)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _empty_stats() -> IndexStats:
+    return IndexStats(
+        total_files=0, files_by_type={}, files_by_repo={}, files_by_technology={},
+        last_indexed=None, total_dependencies=0
+    )
+
+
+def test_concurrent_writes_bump_version_and_stats_once_each():
+    db = DatabaseManager()
+    db._stats.load(_empty_stats())
+
+    _run_concurrently(lambda i: db._record_writes([_insert(i)]))
+
+    writes = THREADS * WRITES_PER_THREAD
+    assert db._write_version == writes
+    stats = db._stats.peek()
+    assert stats.total_files == writes
+    assert stats.files_by_type == {"bicep": writes}
+    assert stats.files_by_repo == {"azure-iac": writes}
+    assert stats.total_dependencies == 2 * writes
+
+
+def test_concurrent_apply_keeps_every_delta():
+    db = DatabaseManager()
+    db._stats.load(_empty_stats())
+
+    _run_concurrently(lambda i: db._stats.apply([_insert(i)]))
+
+    assert db._stats.peek().total_files == THREADS * WRITES_PER_THREAD
+
+
+def test_empty_write_changes_nothing():
+    db = DatabaseManager()
+    db._record_writes([])
+    assert db._write_version == 0
@@ -0,0 +1,121 @@
+"""
+Behaviour of the TOON encoder used for TOOL_RESULT_FORMAT=toon
+"""
+from datetime import datetime
+
+import pytest
+
+import toon
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("plain", "plain"),
+    ("two words", "two words"),
+    ("", '""'),
+    (" padded", '" padded"'),
+    ("true", '"true"'),
+    ("null", '"null"'),
+    ("42", '"42"'),
+    ("-1.5e3", '"-1.5e3"'),
+    ("007", '"007"'),
+    ("- item", '"- item"'),
+    ("a,b", '"a,b"'),
+    ("key: value", '"key: value"'),
+    ('say "hi"', '"say \\"hi\\""'),
+    ("line\nbreak", '"line\\nbreak"'),
+    ("back\\slash", '"back\\\\slash"'),
+])
+def test_string_quoting(value, expected):
+    assert toon.encode(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, "null"),
+    (True, "true"),
+    (False, "false"),
+    (3, "3"),
+    (0.5, "0.5"),
+    (float("nan"), "null"),
+    (float("inf"), "null"),
+    (datetime(2025, 10, 29, 18, 0), "2025-10-29T18:00:00"),
+])
+def test_primitives(value, expected):
+    assert toon.encode(value) == expected
+
+
+def test_object_with_inline_primitive_lists():
+    assert toon.encode({"path": "a/b.bicep", "tags": ["azure", "storage"], "deps": ("x",)}) == (
+        "path: a/b.bicep\n"
+        "tags[2]: azure,storage\n"
+        "deps[1]: x"
+    )
+
+
+def test_keys_needing_quotes():
+    assert toon.encode({"a b": 1, "ok_key.x": 2}) == '"a b": 1\nok_key.x: 2'
+
+
+def test_empty_containers():
+    assert toon.encode({"results": [], "meta": {}, "count": 0}) == (
+        "results[0]:\n"
+        "meta:\n"
+        "count: 0"
+    )
+    assert toon.encode([]) == "[0]:"
+    assert toon.encode({}) == ""
+
+
+def test_uniform_flat_objects_become_a_table():
+    rows = [
+        {"path": "a.tf", "repo": "azure-iac", "score": 0.5},
+        {"path": "b.tf", "repo": "x, y", "score": None},
+    ]
+    assert toon.encode({"results": rows}) == (
+        "results[2]{path,repo,score}:\n"
+        "  a.tf,azure-iac,0.5\n"
+        '  b.tf,"x, y",null'
+    )
+
+
+def test_objects_with_list_values_use_list_form():
+    rows = [
+        {"path": "a.tf", "tags": ["x", "y"]},
+        {"path": "b.tf", "tags": []},
+    ]
+    assert toon.encode({"results": rows}) == (
+        "results[2]:\n"
+        "  - path: a.tf\n"
+        "    tags[2]: x,y\n"
+        "  - path: b.tf\n"
+        "    tags[0]:"
+    )
+
+
+def test_differently_shaped_objects_use_list_form():
+    assert toon.encode([{"a": 1}, {"b": 2}, {}]) == (
+        "[3]:\n"
+        "  - a: 1\n"
+        "  - b: 2\n"
+        "  -"
+    )
+
+
+def test_nested_objects_and_lists():
+    value = {
+        "graph": {"root": "main.bicep", "depth": 2},
+        "levels": [[1, 2], [3]],
+        "items": [{"name": "n", "meta": {"lines": 10}}, "loose"],
+    }
+    assert toon.encode(value) == (
+        "graph:\n"
+        "  root: main.bicep\n"
+        "  depth: 2\n"
+        "levels[2]:\n"
+        "  - [2]: 1,2\n"
+        "  - [1]: 3\n"
+        "items[2]:\n"
+        "  - name: n\n"
+        "    meta:\n"
+        "      lines: 10\n"
+        "  - loose"
+    )
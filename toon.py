@@ -0,0 +1,131 @@
+"""
+TOON (Token-Oriented Object Notation) encoding for Emperion Knowledge Base
+
+A JSON-equivalent text format that spends fewer LLM tokens: no braces or
+quotes around plain keys and values, and primitive lists on one line. Lists
+of flat same-shaped objects become a table with the field names stated once;
+listing records carry tag lists, so they use the indented "- " form instead.
+"""
+import math
+import re
+from datetime import date, datetime
+from typing import Any, List, Optional
+
+_INDENT = "  "
+# Unquoted strings must not read back as a number, bool or null
+_NUMBER_LIKE = re.compile(r"^-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?$|^0\d+$")
+_SPECIAL = frozenset(':,"\\[]{}#\n\r\t')
+_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t"})
+_KEY = re.compile(r"^[A-Za-z_][\w.]*$")
+
+
+def encode(value: Any) -> str:
+    """TOON text for a JSON-compatible value (tuples as arrays, datetimes as ISO 8601)"""
+    lines: List[str] = []
+    if isinstance(value, dict):
+        _object(value, 0, lines)
+    elif isinstance(value, (list, tuple)):
+        _array("", value, 0, lines)
+    else:
+        return _primitive(value)
+    return "\n".join(lines)
+
+
+def _primitive(value: Any) -> str:
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        # Like JSON, NaN and infinities have no representation
+        return repr(value) if math.isfinite(value) else "null"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return _string(str(value))
+
+
+def _string(value: str) -> str:
+    if (
+        not value
+        or value != value.strip()
+        or value in ("true", "false", "null")
+        or value.startswith("-")
+        or _NUMBER_LIKE.match(value)
+        or not _SPECIAL.isdisjoint(value)
+    ):
+        return '"' + value.translate(_ESCAPES) + '"'
+    return value
+
+
+def _key(key: Any) -> str:
+    key = str(key)
+    return key if _KEY.match(key) else '"' + key.translate(_ESCAPES) + '"'
+
+
+def _is_primitive(value: Any) -> bool:
+    return not isinstance(value, (dict, list, tuple))
+
+
+def _object(obj: dict, depth: int, lines: List[str]) -> None:
+    prefix = _INDENT * depth
+    for key, value in obj.items():
+        if isinstance(value, dict):
+            lines.append(f"{prefix}{_key(key)}:")
+            _object(value, depth + 1, lines)
+        elif isinstance(value, (list, tuple)):
+            _array(_key(key), value, depth, lines)
+        else:
+            lines.append(f"{prefix}{_key(key)}: {_primitive(value)}")
+
+
+def _array(key: str, items: Any, depth: int, lines: List[str]) -> None:
+    prefix = _INDENT * depth
+    header = f"{prefix}{key}[{len(items)}]"
+    if all(_is_primitive(item) for item in items):
+        lines.append(f"{header}: " + ",".join(map(_primitive, items)) if items else f"{header}:")
+        return
+
+    fields = _table_fields(items)
+    if fields is not None:
+        lines.append(f"{header}{{{','.join(map(_key, fields))}}}:")
+        row_prefix = _INDENT * (depth + 1)
+        for item in items:
+            lines.append(row_prefix + ",".join(_primitive(item[f]) for f in fields))
+        return
+
+    lines.append(f"{header}:")
+    item_prefix = _INDENT * (depth + 1)
+    for item in items:
+        if isinstance(item, dict) and item:
+            # First field shares the "- " line; the rest align under it
+            nested: List[str] = []
+            _object(item, depth + 2, nested)
+            lines.append(f"{item_prefix}- {nested[0].lstrip()}")
+            lines.extend(nested[1:])
+        elif isinstance(item, (list, tuple)):
+            nested = []
+            _array("", item, depth + 1, nested)
+            lines.append(f"{item_prefix}- {nested[0].lstrip()}")
+            lines.extend(nested[1:])
+        elif isinstance(item, dict):
+            lines.append(f"{item_prefix}-")
+        else:
+            lines.append(f"{item_prefix}- {_primitive(item)}")
+
+
+def _table_fields(items: Any) -> Optional[tuple]:
+    """Shared field names if every item is a dict of primitives with the same keys"""
+    first = items[0]
+    if not isinstance(first, dict) or not first:
+        return None
+    fields = tuple(first)
+    for item in items:
+        if not isinstance(item, dict) or tuple(item) != fields:
+            return None
+        if not all(_is_primitive(v) for v in item.values()):
+            return None
+    return fields